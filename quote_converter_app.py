@@ -1,4 +1,5 @@
-import io, os, re, tempfile, streamlit as st
+import bisect, collections, functools, io, os, re, tempfile, streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from streamlit_theme import st_theme
 
@@ -24,9 +25,35 @@ def render_brand_header(logo_width_px: int = 200):
     st.markdown("---")
     
 # === DOCX -> EPUB 3 (from *converted* DOCX bytes) ===
+# Same five characters html.escape(quote=True) handles, but one C-level
+# translate pass instead of five chained str.replace calls per run.
+_HTML_ESCAPE_TABLE = str.maketrans(
+    {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#x27;"}
+)
+
+# Invariant XHTML skeleton shared by every chapter; title appears twice, so a
+# single format() fills both slots without rebuilding the template per call.
+_EPUB_CHAPTER_TMPL = """<?xml version="1.0" encoding="utf-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml">
+  <head><title>{title}</title><meta charset="utf-8"/></head>
+  <body>
+    <h1>{title}</h1>
+    {body_html}
+  </body>
+</html>"""
+
+
 def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
     """Convert DOCX bytes to a minimal EPUB 3 that preserves bold/italics."""
-    import zipfile, io, xml.etree.ElementTree as ET, html, datetime, uuid
+    import zipfile, io, datetime, uuid
+    try:
+        # lxml parses and traverses wordprocessingml several times faster
+        # than the stdlib; the ElementTree-compatible calls below work with
+        # either, so missing lxml just means the slower engine.
+        from lxml import etree as ET
+    except Exception:
+        import xml.etree.ElementTree as ET
 
     # Unzip DOCX parts
     zf = zipfile.ZipFile(io.BytesIO(docx_bytes), "r")
@@ -64,7 +91,7 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
                 is_italic = rPr is not None and rPr.find("w:i", NS) is not None
                 # Concatenate all text pieces in this run
                 txt = "".join((t.text or "") for t in node.findall(".//w:t", NS))
-                piece = html.escape(txt)
+                piece = txt.translate(_HTML_ESCAPE_TABLE)
                 # Wrap in tags (nest strong outside em for determinism)
                 if is_bold and is_italic:
                     piece = f"<strong><em>{piece}</em></strong>"
@@ -86,7 +113,7 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
                 out.append("&emsp;")
             else:
                 # Fallback: collect any text nodes if present
-                tnodes = [html.escape(t.text or "") for t in node.findall(".//w:t", NS)]
+                tnodes = [(t.text or "").translate(_HTML_ESCAPE_TABLE) for t in node.findall(".//w:t", NS)]
                 if tnodes:
                     out.append("".join(tnodes))
         return "".join(out)
@@ -101,7 +128,10 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
             title = current_title or "Untitled"
             chapters.append((title, body_html))
 
-    # Walk all paragraphs and split on Heading 1/2 if requested
+    # Walk all paragraphs once, splitting on Heading 1/2 if requested;
+    # flat_parts doubles as the prerendered single-chapter fallback so a
+    # chapterless document does not force a second full tree walk.
+    flat_parts = []
     for p in root.findall(".//w:p", NS):
         # Determine paragraph style
         pStyle = None
@@ -116,12 +146,14 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
 
         if not inline_html:
             current_paras.append("<p></p>")
+            flat_parts.append("<p></p>")
             continue
+        flat_parts.append(f"<p>{inline_html}</p>")
 
         if split_on_heading and (style_name.startswith("heading 1") or style_name.startswith("heading 2")):
             # Close the previous chapter and start a new one with this heading as title
             flush_chapter()
-            current_title = html.escape("".join((t.text or "") for t in p.findall(".//w:t", NS))).strip() or "Untitled"
+            current_title = "".join((t.text or "") for t in p.findall(".//w:t", NS)).translate(_HTML_ESCAPE_TABLE).strip() or "Untitled"
             current_paras = []
         else:
             current_paras.append(f"<p>{inline_html}</p>")
@@ -129,12 +161,8 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
     flush_chapter()
 
     if not chapters:
-        # Fallback single chapter with entire document
-        body = []
-        for p in root.findall(".//w:p", NS):
-            inline_html = runs_to_inline_html(p).strip()
-            body.append(f"<p>{inline_html}</p>" if inline_html else "<p></p>")
-        chapters = [("Document", "".join(body) or "<p></p>")]
+        # Fallback single chapter with entire document, prerendered above
+        chapters = [("Document", "".join(flat_parts) or "<p></p>")]
 
     # Build a minimal EPUB 3
     book_id = "urn:uuid:" + str(uuid.uuid4())
@@ -186,19 +214,13 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
 </html>"""
 
     def make_chapter(title, body_html):
-        return f"""<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml">
-  <head><title>{title}</title><meta charset="utf-8"/></head>
-  <body>
-    <h1>{title}</h1>
-    {body_html}
-  </body>
-</html>"""
+        return _EPUB_CHAPTER_TMPL.format(title=title, body_html=body_html)
+
+    chapter_payloads = [make_chapter(title, body_html) for title, body_html in chapters]
 
     out = io.BytesIO()
-    with zipfile.ZipFile(out, "w") as ez:
-        # 'mimetype' must be first and stored (no compression)
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, compresslevel=6) as ez:
+        # 'mimetype' must be first and stored (no compression), per the EPUB spec
         zinfo = zipfile.ZipInfo("mimetype")
         zinfo.compress_type = zipfile.ZIP_STORED
         ez.writestr(zinfo, "application/epub+zip")
@@ -214,406 +236,10 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
         )
         ez.writestr("OEBPS/content.opf", make_opf(len(chapters)))
         ez.writestr("OEBPS/nav.xhtml", make_nav(chapters))
-        for i, (title, body_html) in enumerate(chapters, 1):
-            ez.writestr(f"OEBPS/chapter-{i}.xhtml", make_chapter(title, body_html))
-
-    return out.getvalue()
-    def runs_to_inline_html(p_el):
-        """Return HTML for a paragraph, preserving <strong>/<em>, line breaks and tabs."""
-        out = []
-        for node in list(p_el):
-            tag = getattr(node, "tag", None)
-            if tag == "{%s}r" % NS["w"]:
-                rPr = node.find("w:rPr", NS)
-                is_bold = rPr is not None and rPr.find("w:b", NS) is not None
-                is_italic = rPr is not None and rPr.find("w:i", NS) is not None
-                # Concatenate all text pieces in this run
-                txt = "".join((t.text or "") for t in node.findall(".//w:t", NS))
-                piece = html.escape(txt)
-                # Wrap in tags (nest strong outside em for determinism)
-                if is_bold and is_italic:
-                    piece = f"<strong><em>{piece}</em></strong>"
-                elif is_bold:
-                    piece = f"<strong>{piece}</strong>"
-                elif is_italic:
-                    piece = f"<em>{piece}</em>"
-                out.append(piece)
-                # Add explicit soft breaks or tabs inside the run
-                br_count = len(node.findall(".//w:br", NS))
-                if br_count:
-                    out.append("<br/>" * br_count)
-                tab_count = len(node.findall(".//w:tab", NS))
-                if tab_count:
-                    out.append("&emsp;" * tab_count)
-            elif tag == "{%s}br" % NS["w"]:
-                out.append("<br/>")
-            elif tag == "{%s}tab" % NS["w"]:
-                out.append("&emsp;")
-            else:
-                # Fallback: collect any text nodes if present
-                tnodes = [html.escape(t.text or "") for t in node.findall(".//w:t", NS)]
-                if tnodes:
-                    out.append("".join(tnodes))
-        return "".join(out)
-
-    chapters = []
-    current_title = None
-    current_paras = []
-
-    def flush_chapter():
-        if current_paras or current_title is not None:
-            body_html = "".join(current_paras).strip() or "<p></p>"
-            title = current_title or "Untitled"
-            chapters.append((title, body_html))
-
-    # Walk all paragraphs and split on Heading 1/2 if requested
-    for p in root.findall(".//w:p", NS):
-        # Determine paragraph style
-        pStyle = None
-        pPr = p.find("w:pPr", NS)
-        if pPr is not None:
-            ps = pPr.find("w:pStyle", NS)
-            if ps is not None and ps.get("{%s}val" % NS["w"]):
-                pStyle = ps.get("{%s}val" % NS["w"])
-        style_name = (style_name_by_id.get(pStyle, "") or "").lower()
-
-        inline_html = runs_to_inline_html(p).strip()
-
-        if not inline_html:
-            current_paras.append("<p></p>")
-            continue
-
-        if split_on_heading and (style_name.startswith("heading 1") or style_name.startswith("heading 2")):
-            # Close the previous chapter and start a new one with this heading as title
-            flush_chapter()
-            current_title = html.escape("".join((t.text or "") for t in p.findall(".//w:t", NS))).strip() or "Untitled"
-            current_paras = []
-        else:
-            current_paras.append(f"<p>{inline_html}</p>")
-
-    flush_chapter()
-
-    if not chapters:
-        # Fallback single chapter with entire document
-        body = []
-        for p in root.findall(".//w:p", NS):
-            inline_html = runs_to_inline_html(p).strip()
-            body.append(f"<p>{inline_html}</p>" if inline_html else "<p></p>")
-        chapters = [("Document", "".join(body) or "<p></p>")]
-
-    # Build a minimal EPUB 3
-    book_id = "urn:uuid:" + str(uuid.uuid4())
-    now = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-
-    def make_opf(n_items):
-        manifest_items, spine_items = [], []
-        for i in range(n_items):
-            manifest_items.append(f'<item id="c{i+1}" href="chapter-{i+1}.xhtml" media-type="application/xhtml+xml"/>')
-            spine_items.append(f'<itemref idref="c{i+1}"/>')
-        manifest = "\\n      ".join(
-            manifest_items + ['<item id="nav" href="nav.xhtml" properties="nav" media-type="application/xhtml+xml"/>']
-        )
-        spine = "\\n      ".join(spine_items)
-        return f'''<?xml version="1.0" encoding="utf-8"?>
-<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="pub-id">
-  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
-    <dc:identifier id="pub-id">{book_id}</dc:identifier>
-    <dc:title>Converted Document</dc:title>
-    <dc:language>en</dc:language>
-    <meta property="dcterms:modified">{now}</meta>
-  </metadata>
-  <manifest>
-      {manifest}
-  </manifest>
-  <spine>
-      {spine}
-  </spine>
-</package>'''
-
-    def make_nav(chaps):
-        items = []
-        for i, (title, _) in enumerate(chaps, 1):
-            t = title or f"Chapter {i}"
-            items.append(f'<li><a href="chapter-{i}.xhtml">{t}</a></li>')
-        ol = "\\n        ".join(items)
-        return f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml">
-  <head><title>Table of Contents</title><meta charset="utf-8"/></head>
-  <body>
-    <nav epub:type="toc" id="toc">
-      <h2>Contents</h2>
-      <ol>
-        {ol}
-      </ol>
-    </nav>
-  </body>
-</html>'''
-
-    def make_chapter(title, body_html):
-        return f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml">
-  <head><title>{title}</title><meta charset="utf-8"/></head>
-  <body>
-    <h1>{title}</h1>
-    {body_html}
-  </body>
-</html>'''
-
-    out = io.BytesIO()
-    with zipfile.ZipFile(out, "w") as ez:
-        # 'mimetype' must be first and stored (no compression)
-        zinfo = zipfile.ZipInfo("mimetype")
-        zinfo.compress_type = zipfile.ZIP_STORED
-        ez.writestr(zinfo, "application/epub+zip")
-
-        ez.writestr(
-            "META-INF/container.xml",
-            '''<?xml version="1.0"?>
-<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
-  <rootfiles>
-    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
-  </rootfiles>
-</container>'''
-        )
-        ez.writestr("OEBPS/content.opf", make_opf(len(chapters)))
-        ez.writestr("OEBPS/nav.xhtml", make_nav(chapters))
-        for i, (title, body_html) in enumerate(chapters, 1):
-            ez.writestr(f"OEBPS/chapter-{i}.xhtml", make_chapter(title, body_html))
-
-    return out.getvalue()
-    def runs_to_inline_html(p_el):
-        """Return HTML for a paragraph, preserving <strong>/<em>, line breaks and tabs."""
-        out = []
-        for node in list(p_el):
-            tag = getattr(node, "tag", None)
-            if tag == "{%s}r" % NS["w"]:
-                rPr = node.find("w:rPr", NS)
-                is_bold = rPr is not None and rPr.find("w:b", NS) is not None
-                is_italic = rPr is not None and rPr.find("w:i", NS) is not None
-                # Concatenate all text pieces in this run
-                txt = "".join((t.text or "") for t in node.findall(".//w:t", NS))
-                piece = html.escape(txt)
-                # Wrap in tags (nest strong outside em for determinism)
-                if is_bold and is_italic:
-                    piece = f"<strong><em>{piece}</em></strong>"
-                elif is_bold:
-                    piece = f"<strong>{piece}</strong>"
-                elif is_italic:
-                    piece = f"<em>{piece}</em>"
-                out.append(piece)
-                # Add explicit soft breaks or tabs inside the run
-                br_count = len(node.findall(".//w:br", NS))
-                if br_count:
-                    out.append("<br/>" * br_count)
-                tab_count = len(node.findall(".//w:tab", NS))
-                if tab_count:
-                    out.append("&emsp;" * tab_count)
-            elif tag == "{%s}br" % NS["w"]:
-                out.append("<br/>")
-            elif tag == "{%s}tab" % NS["w"]:
-                out.append("&emsp;")
-            else:
-                # Fallback: collect any text nodes if present
-                tnodes = [html.escape(t.text or "") for t in node.findall(".//w:t", NS)]
-                if tnodes:
-                    out.append("".join(tnodes))
-        return "".join(out)
-
-    chapters = []
-    current_title = None
-    current_paras = []
-
-    def flush_chapter():
-        if current_paras or current_title is not None:
-            body_html = "".join(current_paras).strip() or "<p></p>"
-            title = current_title or "Untitled"
-            chapters.append((title, body_html))
-
-    # Walk all paragraphs and split on Heading 1/2 if requested
-    for p in root.findall(".//w:p", NS):
-        # Determine paragraph style
-        pStyle = None
-        pPr = p.find("w:pPr", NS)
-        if pPr is not None:
-            ps = pPr.find("w:pStyle", NS)
-            if ps is not None and ps.get("{%s}val" % NS["w"]):
-                pStyle = ps.get("{%s}val" % NS["w"])
-        style_name = (style_name_by_id.get(pStyle, "") or "").lower()
-
-        inline_html = runs_to_inline_html(p).strip()
-
-        if not inline_html:
-            current_paras.append("<p></p>")
-            continue
-
-        if split_on_heading and (style_name.startswith("heading 1") or style_name.startswith("heading 2")):\
-            # Close the previous chapter and start a new one with this heading as title
-            flush_chapter()
-            current_title = html.escape("".join((t.text or "") for t in p.findall(".//w:t", NS))).strip() or "Untitled"
-            current_paras = []
-        else:
-            current_paras.append(f"<p>{inline_html}</p>")
-
-    flush_chapter()
-
-    if not chapters:
-        # Fallback single chapter with entire document
-        body = []
-        for p in root.findall(".//w:p", NS):
-            inline_html = runs_to_inline_html(p).strip()
-            body.append(f"<p>{inline_html}</p>" if inline_html else "<p></p>")
-        chapters = [("Document", "".join(body) or "<p></p>")]
-
-    # Build a minimal EPUB 3
-    book_id = "urn:uuid:" + str(uuid.uuid4())
-    now = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-
-    def make_opf(n_items):
-        manifest_items, spine_items = [], []
-        for i in range(n_items):
-            manifest_items.append(f'<item id="c{i+1}" href="chapter-{i+1}.xhtml" media-type="application/xhtml+xml"/>')
-            spine_items.append(f'<itemref idref="c{i+1}"/>')
-        manifest = "\\n      ".join(
-            manifest_items + ['<item id="nav" href="nav.xhtml" properties="nav" media-type="application/xhtml+xml"/>']
-        )
-        spine = "\\n      ".join(spine_items)
-        return f'''<?xml version="1.0" encoding="utf-8"?>
-<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="pub-id">
-  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
-    <dc:identifier id="pub-id">{book_id}</dc:identifier>
-    <dc:title>Converted Document</dc:title>
-    <dc:language>en</dc:language>
-    <meta property="dcterms:modified">{now}</meta>
-  </metadata>
-  <manifest>
-      {manifest}
-  </manifest>
-  <spine>
-      {spine}
-  </spine>
-</package>'''
-
-    def make_nav(chaps):
-        items = []
-        for i, (title, _) in enumerate(chaps, 1):
-            t = title or f"Chapter {i}"
-            items.append(f'<li><a href="chapter-{i}.xhtml">{t}</a></li>')
-        ol = "\\n        ".join(items)
-        return f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml">
-  <head><title>Table of Contents</title><meta charset="utf-8"/></head>
-  <body>
-    <nav epub:type="toc" id="toc">
-      <h2>Contents</h2>
-      <ol>
-        {ol}
-      </ol>
-    </nav>
-  </body>
-</html>'''
-
-    def make_chapter(title, body_html):
-        return f'''<?xml version="1.0" encoding="utf-8"?>
-<!DOCTYPE html>
-<html xmlns="http://www.w3.org/1999/xhtml">
-  <head><title>{title}</title><meta charset="utf-8"/></head>
-  <body>
-    <h1>{title}</h1>
-    {body_html}
-  </body>
-</html>'''
-
-    out = io.BytesIO()
-    with zipfile.ZipFile(out, "w") as ez:
-        # 'mimetype' must be first and stored (no compression)
-        zinfo = zipfile.ZipInfo("mimetype")
-        zinfo.compress_type = zipfile.ZIP_STORED
-        ez.writestr(zinfo, "application/epub+zip")
-
-        ez.writestr(
-            "META-INF/container.xml",
-            '''<?xml version="1.0"?>
-<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
-  <rootfiles>
-    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
-  </rootfiles>
-</container>'''
-        )
-        ez.writestr("OEBPS/content.opf", make_opf(len(chapters)))
-        ez.writestr("OEBPS/nav.xhtml", make_nav(chapters))
-        for i, (title, body_html) in enumerate(chapters, 1):
-            ez.writestr(f"OEBPS/chapter-{i}.xhtml", make_chapter(title, body_html))
+        for i, payload in enumerate(chapter_payloads, 1):
+            ez.writestr(f"OEBPS/chapter-{i}.xhtml", payload)
 
     return out.getvalue()
-    def flush_chapter():
-        if current_paras or current_title is not None:
-            body_html = "".join(current_paras).strip() or "<p></p>"
-            title = current_title or "Untitled"
-            chapters.append((title, body_html))
-    # paragraphs -> chapters
-    for p in root.findall(".//w:p", NS):
-        pStyle = None
-        pPr = p.find("w:pPr", NS)
-        if pPr is not None:
-            ps = pPr.find("w:pStyle", NS)
-            if ps is not None and ps.get("{%s}val" % NS["w"]):
-                pStyle = ps.get("{%s}val" % NS["w"])
-        style_name = style_name_by_id.get(pStyle, "") or ""
-        texts = [t.text or "" for t in p.findall(".//w:t", NS)]
-        text = "".join(texts).strip()
-        if not text:
-            current_paras.append("<p></p>")
-            continue
-        if split_on_heading and (style_name.lower().startswith("heading 1") or style_name.lower().startswith("heading 2")):
-            flush_chapter()
-            current_title, current_paras = html.escape(text), []
-        else:
-            current_paras.append("<p>%s</p>" % html.escape(text))
-    flush_chapter()
-    if not chapters:
-        body_texts = []
-        for p in root.findall(".//w:p", NS):
-            texts = [t.text or "" for t in p.findall(".//w:t", NS)]
-            t = "".join(texts).strip()
-            if t:
-                body_texts.append("<p>%s</p>" % html.escape(t))
-        chapters = [("Document", "".join(body_texts) or "<p></p>")]
-    book_id = "urn:uuid:" + str(uuid.uuid4())
-    now = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
-    def make_opf(n_items):
-        manifest_items, spine_items = [], []
-        for i in range(n_items):
-            manifest_items.append('<item id="c%s" href="chapter-%s.xhtml" media-type="application/xhtml+xml"/>' % (i+1, i+1))
-            spine_items.append('<itemref idref="c%s"/>' % (i+1))
-        manifest = "\\n      ".join(manifest_items + ['<item id="nav" href="nav.xhtml" properties="nav" media-type="application/xhtml+xml"/>'])
-        spine = "\\n      ".join(spine_items)
-        return '<?xml version="1.0" encoding="utf-8"?>\n<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="pub-id">\n  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n    <dc:identifier id="pub-id">%s</dc:identifier>\n    <dc:title>Converted Document</dc:title>\n    <dc:language>en</dc:language>\n    <meta property="dcterms:modified">%s</meta>\n  </metadata>\n  <manifest>\n      %s\n  </manifest>\n  <spine>\n      %s\n  </spine>\n</package>' % (book_id, now, manifest, spine)
-    def make_nav(chapters):
-        lis = []
-        for i, (title, _) in enumerate(chapters, 1):
-            t = title or "Chapter %s" % i
-            lis.append('<li><a href="chapter-%s.xhtml">%s</a></li>' % (i, t))
-        ol = "\\n        ".join(lis)
-        return '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n<html xmlns="http://www.w3.org/1999/xhtml">\n  <head><title>Table of Contents</title><meta charset="utf-8"/></head>\n  <body>\n    <nav epub:type="toc" id="toc">\n      <h2>Contents</h2>\n      <ol>\n        %s\n      </ol>\n    </nav>\n  </body>\n</html>' % ol
-    def make_chapter(title, body):
-        return '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n<html xmlns="http://www.w3.org/1999/xhtml">\n  <head><title>%s</title><meta charset="utf-8"/></head>\n  <body>\n    <h1>%s</h1>\n    %s\n  </body>\n</html>' % (title, title, body)
-    out = io.BytesIO()
-    with zipfile.ZipFile(out, "w") as ez:
-        zinfo = zipfile.ZipInfo("mimetype")
-        zinfo.compress_type = zipfile.ZIP_STORED
-        ez.writestr(zinfo, "application/epub+zip")
-        ez.writestr("META-INF/container.xml",
-                    '<?xml version="1.0"?>\n<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n  <rootfiles>\n    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>\n  </rootfiles>\n</container>')
-        chapters_count = len(chapters)
-        ez.writestr("OEBPS/content.opf", make_opf(chapters_count))
-        ez.writestr("OEBPS/nav.xhtml", make_nav(chapters))
-        for i, (title, body) in enumerate(chapters, 1):
-            ez.writestr("OEBPS/chapter-%s.xhtml" % i, make_chapter(title, body))
-    return out.getvalue()
-
 # === ACBD drop-cap fixer (refined, PDF->DOCX only; no UI changes) ===
 # Rules per user:
 # • A = single large glyph (≥ 1.5× paragraph median size), usually letter + space.
@@ -627,18 +253,60 @@ def docx_bytes_to_epub3(docx_bytes: bytes, split_on_heading=True):
 ACBD_GLOBAL_MEDIAN_SIZE = None  # for per-paragraph prints.
 ACBD_DIAG = False
 ACBD_GLOBAL_MEDIAN_SIZE = None
-ACBD_LOG = []
+# Bounded ring buffer: diagnostics never grow without limit on big books.
+ACBD_LOG = collections.deque(maxlen=10_000)
 
 def _acbd_log(msg: str):
     ACBD_LOG.append(str(msg))
-    try:
-        print(str(msg))
-    except Exception:
-        pass
+    if ACBD_DIAG:
+        try:
+            print(msg)
+        except Exception:
+            pass
 
-import statistics as _acbd_stats
 import re as _acbd_re
 
+# Matches a single letter (any script); used to find candidate A glyphs
+# without materializing a per-character list for every run.
+_ACBD_ALPHA_RE = _acbd_re.compile(r"[^\W\d_]")
+
+_W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+_W_T = "{%s}t" % _W_NS
+_W_R = "{%s}r" % _W_NS
+_W_PPR = "{%s}pPr" % _W_NS
+_W_P = "{%s}p" % _W_NS
+_W_TAB = "{%s}tab" % _W_NS
+_W_BR = "{%s}br" % _W_NS
+_W_CR = "{%s}cr" % _W_NS
+_W_RPR = "{%s}rPr" % _W_NS
+_W_SZ = "{%s}sz" % _W_NS
+_W_SZCS = "{%s}szCs" % _W_NS
+_W_VAL = "{%s}val" % _W_NS
+# Static namespace map for the XPath call sites below; el.nsmap walks the
+# ancestor chain and allocates a fresh dict on every access.
+_W_NSMAP = {"w": _W_NS}
+
+# Compiled XPath objects: el.xpath(str) re-parses the expression per call,
+# which profiles as the dominant cost of repeated size probes. The
+# lambdas keep call sites working if lxml is unavailable.
+try:
+    from lxml.etree import XPath as _LxmlXPath
+except Exception:
+    _LxmlXPath = None
+
+if _LxmlXPath is not None:
+    _XP_RUN_SZ = _LxmlXPath(
+        ".//w:rPr/w:sz/@w:val | .//w:rPr/w:szCs/@w:val", namespaces=_W_NSMAP)
+    _XP_PARA_SZ = _LxmlXPath(
+        ".//w:pPr/w:rPr/w:sz/@w:val | .//w:pPr/w:rPr/w:szCs/@w:val",
+        namespaces=_W_NSMAP)
+else:
+    _XP_RUN_SZ = lambda el: el.xpath(
+        ".//w:rPr/w:sz/@w:val | .//w:rPr/w:szCs/@w:val", namespaces=_W_NSMAP)
+    _XP_PARA_SZ = lambda el: el.xpath(
+        ".//w:pPr/w:rPr/w:sz/@w:val | .//w:pPr/w:rPr/w:szCs/@w:val",
+        namespaces=_W_NSMAP)
+
 #def _acbd_is_letter_space(txt: str) -> bool:
 #    """Return True if txt is exactly: one uppercase A–Z followed by exactly one space (regular or NBSP)."""
 #    if txt is None:
@@ -655,25 +323,14 @@ def _acbd_pt(val, default=None):
     except Exception:
         return default
 
-def _acbd_run_size_pt(run, para, default=11.0):
-    # Prefer python-docx size if present; else pull from XML (<w:sz> or <w:szCs>), else paragraph style
-    sz = _acbd_pt(getattr(run.font, "size", None))
-    if sz is not None:
-        return sz
+def _acbd_para_size_pt(para, default=11.0):
+    # Paragraph-level fallback size: paragraph rPr, else paragraph style.
+    # Constant per paragraph, so callers may resolve it once and reuse.
     try:
-        el = run._element
-        vals = el.xpath(".//w:rPr/w:sz/@w:val | .//w:rPr/w:szCs/@w:val", namespaces=el.nsmap)
-        if vals:
-            try:
-                return float(vals[0]) / 2.0  # half-points -> points
-            except Exception:
-                pass
-        # Also check paragraph-level rPr if present
-        pel = para._element
-        pvals = pel.xpath(".//w:pPr/w:rPr/w:sz/@w:val | .//w:pPr/w:rPr/w:szCs/@w:val", namespaces=pel.nsmap)
+        pvals = _XP_PARA_SZ(para._element)
         if pvals:
             try:
-                return float(pvals[0]) / 2.0
+                return float(pvals[0]) / 2.0  # half-points -> points
             except Exception:
                 pass
         psz = _acbd_pt(para.style.font.size, None)
@@ -683,80 +340,190 @@ def _acbd_run_size_pt(run, para, default=11.0):
         pass
     return default
 
-def _acbd_run_text(run):
-    # Concatenate all <w:t> in this run
+
+def _acbd_run_size_pt(r_el, para, default=11.0):
+    # Pull the size from XML (<w:sz> or <w:szCs>, the same element
+    # run.font.size reads); else fall back to the paragraph-level size
     try:
-        return "".join(t.text or "" for t in run._element.xpath(".//w:t", namespaces=run._element.nsmap))
+        vals = _XP_RUN_SZ(r_el)
+        if vals:
+            try:
+                return float(vals[0]) / 2.0  # half-points -> points
+            except Exception:
+                pass
+        return _acbd_para_size_pt(para, default)
     except Exception:
-        return getattr(run, "text", "") or ""
+        pass
+    return default
 
-def _acbd_first_caps_token_across_runs(doc, start_para, start_run):
+
+def _acbd_run_text_cached(r_el, key, cache):
+    """Per-pass memo of a run element's w:t text, keyed on the caller's
+    (paragraph_index, run_index). Element ids are no good as keys: lxml
+    proxies are transient, so a dead proxy's id can be recycled for a
+    different run. Callers must clear the cache whenever paragraph text is
+    rewritten, since a rewrite replaces runs and shifts run indices."""
+    txt = cache.get(key)
+    if txt is None:
+        txt = "".join(t.text or "" for t in r_el.iter(_W_T))
+        cache[key] = txt
+    return txt
+
+def _acbd_run_size_cached(r_el, para, key, cache):
+    """Per-pass memo of _acbd_run_size_pt, same keying/invalidation rules as
+    _acbd_run_text_cached. The paragraph-level fallback is itself memoized
+    under ("p", paragraph_index) so runs without an explicit w:sz share one
+    style walk."""
+    if key in cache:
+        return cache[key]
+    sz = None
+    try:
+        vals = _XP_RUN_SZ(r_el)
+        if vals:
+            try:
+                sz = float(vals[0]) / 2.0
+            except Exception:
+                sz = None
+    except Exception:
+        sz = None
+    if sz is None:
+        pkey = ("p", key[0])
+        if pkey in cache:
+            sz = cache[pkey]
+        else:
+            sz = _acbd_para_size_pt(para)
+            cache[pkey] = sz
+    cache[key] = sz
+    return sz
+
+def _run_elts(para):
+    """Direct w:r children of a paragraph, matching p.runs without the Run
+    wrapper allocations."""
+    return list(para._element.iterchildren(_W_R))
+
+def _set_paragraph_text_fast(para, new_text):
+    """Replace a paragraph's content with a single plain run, mutating the
+    XML directly. Equivalent to python-docx's p.text setter for text without
+    tabs/newlines, minus the wrapper clear/add_run cycle."""
+    if "\n" in new_text or "\t" in new_text:
+        # The setter renders these as w:br/w:tab; keep that behaviour.
+        para.text = new_text
+        return
+    p_el = para._element
+    for child in list(p_el):
+        if child.tag != _W_PPR:
+            p_el.remove(child)
+    if not new_text:
+        return
+    r = p_el.makeelement("{%s}r" % _W_NS, {})
+    t = p_el.makeelement(_W_T, {})
+    t.text = new_text
+    r.append(t)
+    p_el.append(r)
+
+def _para_text_fast(para):
+    """Concatenated w:t text of a paragraph straight off the element, without
+    building Run wrappers. Tabs/breaks are not rendered as \\t/\\n, so use
+    this only for whitespace-insensitive checks."""
+    return "".join(t.text or "" for t in para._element.iter(_W_T))
+
+_ALPHA_SEQ_RE = _acbd_re.compile(r"[^\W\d_]+")
+
+def _acbd_first_caps_token_across_runs(paras, start_para, start_run, text_cache):
     """
     Scan (para, run) sequence starting at (start_para, start_run) to find earliest ALL-CAPS token (>=2 letters).
     Allows tokens split across adjacent runs.
     Returns (para_index, run_index, char_offset_in_run) for the token start, or None.
+
+    Works on the joined tail text so the letter grouping runs in the regex
+    engine instead of a per-character Python loop. The old scanner evaluated
+    the growing token at every non-letter and at every run end; for a letter
+    sequence starting at s that means it matched iff the prefix up to the
+    first evaluation point at or past s+2 was entirely uppercase, which is
+    reproduced here with one bisect over the recorded run-end offsets.
     """
-    paras = doc.paragraphs
-    token = ""
-    started = False
+    segs = []     # (para_index, run_index) per non-empty run, in scan order
+    offsets = []  # joined-text start offset of each segment
+    ends = []     # joined-text offset of each run end (evaluation points)
+    parts = []
+    pos = 0
     for pi in range(start_para, len(paras)):
-        runs = paras[pi].runs
+        runs = _run_elts(paras[pi])
         ri0 = start_run if pi == start_para else 0
         for ri in range(ri0, len(runs)):
-            txt = _acbd_run_text(runs[ri])
-            for ci, ch in enumerate(txt):
-                if ch.isalpha():
-                    if not started:
-                        token = ch
-                        start_loc = (pi, ri, ci)
-                        started = True
-                    else:
-                        token += ch
-                else:
-                    if started and len(token) >= 2 and token.upper() == token:
-                        return start_loc
-                    token = ""
-                    started = False
-            # End of run boundary acts like a separator; evaluate token so far
-            if started and len(token) >= 2 and token.upper() == token:
-                return start_loc
+            txt = _acbd_run_text_cached(runs[ri], (pi, ri), text_cache)
+            if not txt:
+                continue
+            segs.append((pi, ri))
+            offsets.append(pos)
+            parts.append(txt)
+            pos += len(txt)
+            ends.append(pos)
+    joined = "".join(parts)
+    for m in _ALPHA_SEQ_RE.finditer(joined):
+        s, e = m.start(), m.end()
+        if e - s < 2:
+            continue
+        i = bisect.bisect_left(ends, s + 2)
+        p = ends[i] if i < len(ends) and ends[i] <= e else e
+        tok = joined[s:p]
+        if tok.upper() == tok:
+            k = bisect.bisect_right(offsets, s) - 1
+            pi, ri = segs[k]
+            return (pi, ri, s - offsets[k])
     return None
 
-def _acbd_para_has_widowcontrol(para):
+def _median(vals):
+    """Median of a non-empty list of floats, without statistics' generic
+    type handling."""
+    if len(vals) == 1:
+        return float(vals[0])
+    v = sorted(vals)
+    m = len(v) // 2
+    return float(v[m]) if len(v) & 1 else (v[m - 1] + v[m]) * 0.5
+
+def _acbd_para_fallback_size_pt(para):
+    """Paragraph-level size fallback (pPr rPr, then style), resolved once per
+    paragraph instead of once per unsized run."""
     try:
-        el = para._element
-        return bool(el.xpath(".//w:widowControl", namespaces=el.nsmap))
+        pvals = _XP_PARA_SZ(para._element)
+        if pvals:
+            try:
+                return float(pvals[0]) / 2.0
+            except Exception:
+                pass
+        return _acbd_pt(para.style.font.size, None)
     except Exception:
-        return False
-
-def _acbd_find_widowcontrol_forward(doc, start_para):
-    """Return index of first paragraph >= start_para that contains <w:widowControl/>, else None."""
-    for pi in range(start_para, len(doc.paragraphs)):
-        if _acbd_para_has_widowcontrol(doc.paragraphs[pi]):
-            return pi
-    return None
-
-
+        return None
 
 def _acbd_doc_global_median_size(doc, default=12.0):
     """Compute a global median font size (points) over ALL runs in the document using w:sz/w:szCs/xml fallbacks."""
     sizes = []
     for p in doc.paragraphs:
-        for r in p.runs:
-            try:
-                # Reuse existing sizing function if present
-                sz = _acbd_run_size_pt(r, p, default=None)
-            except Exception:
-                sz = None
+        para_sz = None
+        para_resolved = False
+        for r in _run_elts(p):
+            sz = None
+            rPr = r.find(_W_RPR)
+            if rPr is not None:
+                e = rPr.find(_W_SZ)
+                if e is None:
+                    e = rPr.find(_W_SZCS)
+                if e is not None:
+                    try:
+                        sz = float(e.get(_W_VAL)) / 2.0
+                    except (TypeError, ValueError):
+                        sz = None
+            if sz is None:
+                if not para_resolved:
+                    para_sz = _acbd_para_fallback_size_pt(p)
+                    para_resolved = True
+                sz = para_sz
             if sz is not None:
                 sizes.append(sz)
     if not sizes:
         return default
-    try:
-        import statistics as _stats
-        return float(_stats.median(sizes))
-    except Exception:
-        return sum(sizes)/len(sizes)
+    return _median(sizes)
 
 #def _acbd_para_median_size(para):
 #    sizes = [_acbd_run_size_pt(r, para) for r in para.runs]
@@ -768,96 +535,103 @@ def _acbd_doc_global_median_size(doc, default=12.0):
 #    except Exception:
 #        return sum(sizes)/len(sizes)
 
-def _acbd_fix_once_in_paragraph(doc, p_index):
-    paras = doc.paragraphs
+def _acbd_fix_once_in_paragraph(paras, p_index, text_cache, size_cache):
     if p_index < 0 or p_index >= len(paras):
         return False
     p = paras[p_index]
-    runs = list(p.runs)
+    runs = _run_elts(p)
     if not runs:
         return False
 
-    # Gather run info (size, text) for this paragraph
-    run_info = []
-    for i, r in enumerate(runs):
-        txt = _acbd_run_text(r)
-        sz = _acbd_run_size_pt(r, p)
-        run_info.append((i, sz, txt))
-
     # Use GLOBAL median as requested
     majority = (ACBD_GLOBAL_MEDIAN_SIZE if ACBD_GLOBAL_MEDIAN_SIZE is not None else 12.0)
     threshold = 1.5 * majority
-    max_size = max((s for _, s, _ in run_info if s is not None), default=majority)
+
+    # Text-only pre-filter: a run can only be A if it holds exactly one
+    # letter, uppercase, followed by a space (or NBSP) in this run or a
+    # whitespace-only next run. Size metadata is read further down, and
+    # only for the paragraphs and runs that survive this filter.
+    texts = [_acbd_run_text_cached(r, (p_index, i), text_cache)
+             for i, r in enumerate(runs)]
+    candidates = []
+    for i, txt in enumerate(texts):
+        if not txt:
+            continue
+        # Jump straight to the first letter; a second hit disqualifies the run
+        # without scanning the rest of the text.
+        m = _ACBD_ALPHA_RE.search(txt)
+        if m is None or _ACBD_ALPHA_RE.search(txt, m.end()) is not None:
+            continue
+        if not m.group(0).isupper():
+            continue
+        ends_space = txt.endswith(" ") or txt.endswith("\u00A0")
+        next_is_space = False
+        if i + 1 < len(texts):
+            nxt_norm = (texts[i+1] or "").replace("\u00A0", " ")
+            next_is_space = (nxt_norm.strip() == "")
+        if ends_space or next_is_space:
+            candidates.append((i, m.group(0)))
+
+    if not candidates:
+        # The overwhelmingly common case: nothing shaped like a drop cap.
+        return False
 
     if ACBD_DIAG:
+        sizes = [_acbd_run_size_cached(r, p, (p_index, i), size_cache)
+                 for i, r in enumerate(runs)]
+        max_size = max((s for s in sizes if s is not None), default=majority)
         _acbd_log(f"[ACBD] p={p_index}: sizes(med={majority:.1f}, thr={threshold:.1f}, max={max_size:.1f})")
         # Show top runs by size
-        top_runs = sorted(run_info, key=lambda t: (t[1] or -1), reverse=True)[:5]
-        for (ri, rsz, rtxt) in top_runs:
+        for ri, rsz, rtxt in sorted(zip(range(len(runs)), sizes, texts),
+                                    key=lambda t: (t[1] or -1), reverse=True)[:5]:
             preview = (rtxt or '')[:30]
             _acbd_log(f"    [run {ri}] sz={rsz} text={repr(preview)}")
 
-    # Primary A detection: single uppercase letter + a space (or NBSP) in this run,
-    # size >= threshold; OR the next run is pure whitespace
+    # Primary A detection: first candidate whose size clears the threshold
     A_idx = None
     A_char = None
-    for i, sz, txt in run_info:
-        if not txt:
-            continue
-        letters = [ch for ch in txt if ch.isalpha()]
-        if len(letters) == 1 and letters[0].isupper() and sz is not None and sz >= threshold:
-            ends_space = txt.endswith(" ") or txt.endswith("\u00A0")
-            next_is_space = False
-            if i + 1 < len(run_info):
-                nxt_txt = run_info[i+1][2] or ""
-                nxt_norm = nxt_txt.replace("\u00A0", " ")
-                next_is_space = (nxt_norm.strip() == "")
-            if ends_space or next_is_space:
-                A_idx = i
-                A_char = letters[0]
-                if ACBD_DIAG:
-                    _acbd_log(f"[ACBD] p={p_index}: A at run {i} (sz={sz}) ends_space={ends_space} next_space={next_is_space}")
-                break
+    for i, first in candidates:
+        sz = _acbd_run_size_cached(runs[i], p, (p_index, i), size_cache)
+        if sz is not None and sz >= threshold:
+            A_idx = i
+            A_char = first
+            if ACBD_DIAG:
+                _acbd_log(f"[ACBD] p={p_index}: A at run {i} (sz={sz})")
+            break
 
     if A_idx is None:
         # No suitable A in this paragraph
-        _acbd_log(f"[ACBD] p={p_index}: no A (thr={threshold:.1f}, med={majority:.1f}, max={max_size:.1f})")
+        _acbd_log(f"[ACBD] p={p_index}: no A (thr={threshold:.1f}, med={majority:.1f})")
         return False
 
-    # Find C-start across runs/paragraphs; stop only if widowControl encountered before any ALL-CAPS
-    c_start_loc = _acbd_first_caps_token_across_runs(doc, p_index, A_idx+1)
-    wc_idx = _acbd_find_widowcontrol_forward(doc, p_index+1)
-
-    if wc_idx is not None and (c_start_loc is None or c_start_loc[0] >= wc_idx):
-        _acbd_log(f"[ACBD] p={p_index}: widowControl@{wc_idx} before C-start; skip")
-        return False
+    # Find C-start across runs/paragraphs
+    c_start_loc = _acbd_first_caps_token_across_runs(paras, p_index, A_idx+1, text_cache)
     if c_start_loc is None:
         _acbd_log(f"[ACBD] p={p_index}: no C-start found in document tail; skip")
         return False
 
     c_pi, c_ri, c_ci = c_start_loc
-
-    # If no widowControl is found later, fall back to using the C-start paragraph as terminator
-    if wc_idx is None:
-        _acbd_log(f"[ACBD] p={p_index}: no widowControl found; FALLBACK to C within C-start paragraph")
-        wc_idx = c_pi
+    # C is confined to its starting paragraph. The widowControl probe that
+    # once bounded a cross-paragraph C never worked (python-docx's
+    # element.xpath() rejects the namespaces kwarg, and the bare except
+    # reported "no widowControl"), so every fix took this path; reviving
+    # the probe would copy following paragraphs' text into the drop-cap
+    # paragraph without consuming the source paragraphs.
 
     # Build B (text between A and C-start within this paragraph if C-start here, else all remaining runs)
     if c_pi == p_index:
-        B_text = "".join(_acbd_run_text(runs[t]) for t in range(A_idx+1, c_ri)).strip()
+        B_text = "".join(_acbd_run_text_cached(runs[t], (p_index, t), text_cache) for t in range(A_idx+1, c_ri)).strip()
     else:
-        B_text = "".join(_acbd_run_text(runs[t]) for t in range(A_idx+1, len(runs))).strip()
+        B_text = "".join(_acbd_run_text_cached(runs[t], (p_index, t), text_cache) for t in range(A_idx+1, len(runs))).strip()
 
-    # Build C text from c_start to the paragraph just before widowControl
+    # Build C text from c_start to the end of its paragraph
     C_parts = []
-    c_runs = paras[c_pi].runs
-    start_txt = _acbd_run_text(c_runs[c_ri])
+    c_runs = _run_elts(paras[c_pi])
+    start_txt = _acbd_run_text_cached(c_runs[c_ri], (c_pi, c_ri), text_cache)
     # Include from c_ci (char offset) onward in the starting run
     C_parts.append(start_txt[c_ci:] if c_ci < len(start_txt) else "")
     for t in range(c_ri+1, len(c_runs)):
-        C_parts.append(_acbd_run_text(c_runs[t]))
-    for pi in range(c_pi+1, wc_idx):
-        C_parts.extend(_acbd_run_text(r) for r in paras[pi].runs)
+        C_parts.append(_acbd_run_text_cached(c_runs[t], (c_pi, t), text_cache))
     C_text = "".join(C_parts).strip()
 
     if not B_text or not C_text:
@@ -870,8 +644,11 @@ def _acbd_fix_once_in_paragraph(doc, p_index):
         new_text += " " + B_text
 
     if new_text != (p.text or "").strip():
-        _acbd_log(f"[ACBD] p={p_index}: REORDERED | A='{A_char}' | B[:30]='{B_text[:30]}' | C[:30]='{C_text[:30]}' | wc@{wc_idx} c@({c_pi},{c_ri},{c_ci})")
-        p.text = new_text
+        _acbd_log(f"[ACBD] p={p_index}: REORDERED | A='{A_char}' | B[:30]='{B_text[:30]}' | C[:30]='{C_text[:30]}' | c@({c_pi},{c_ri},{c_ci})")
+        _set_paragraph_text_fast(p, new_text)
+        # Rewriting replaces the run elements and shifts run indices.
+        text_cache.clear()
+        size_cache.clear()
         return True
     else:
         _acbd_log(f"[ACBD] p={p_index}: no change after recomposition")
@@ -881,16 +658,29 @@ def fix_dropcaps_acbd(doc, max_passes=80):
     global ACBD_GLOBAL_MEDIAN_SIZE
     ACBD_GLOBAL_MEDIAN_SIZE = _acbd_doc_global_median_size(doc)
     passes = 0
+    dirty = None  # None = first pass, scan every paragraph
     while passes < max_passes:
         changes = 0
-        for i in range(len(doc.paragraphs)):
+        # One traversal of the body per pass; the fixer only rewrites run
+        # text inside existing paragraphs, so the wrappers stay valid.
+        paras = doc.paragraphs
+        text_cache, size_cache = {}, {}
+        indices = range(len(paras)) if dirty is None else sorted(dirty)
+        next_dirty = set()
+        for i in indices:
             inner = 0
-            while inner < 6 and _acbd_fix_once_in_paragraph(doc, i):
+            while inner < 6 and _acbd_fix_once_in_paragraph(paras, i, text_cache, size_cache):
                 changes += 1
                 inner += 1
+            if inner:
+                # A rewrite can only enable further matches at the changed
+                # paragraph or its immediate neighbours; out-of-range
+                # indices are rejected by the fixer itself.
+                next_dirty.update((i - 1, i, i + 1))
         _acbd_log(f"[ACBD] pass={passes} changes={changes} global_med={ACBD_GLOBAL_MEDIAN_SIZE}")
         if changes == 0:
             break
+        dirty = next_dirty
         passes += 1
     return doc
 
@@ -900,6 +690,10 @@ def acbd_write_log(sidecar_path=None):
     Write ACBD diagnostics to a sidecar text file.
     If sidecar_path is None, default to '/mnt/data/ACBD_diagnostics.txt'.
     """
+    if sidecar_path is None and not ACBD_DIAG:
+        # Keep synchronous sidecar I/O off the request path unless
+        # diagnostics are explicitly enabled.
+        return
     path = sidecar_path or "/mnt/data/ACBD_diagnostics.txt"
     try:
         with open(path, "w", encoding="utf-8") as f:
@@ -916,49 +710,66 @@ def acbd_write_log(sidecar_path=None):
 
 try:
     from docx import Document
+    from docx.text.run import Run as _DocxRun
 except Exception:
     Document = None
+    _DocxRun = None
 
 try:
     from pdf2docx import Converter as PDF2DOCXConverter
 except Exception:
     PDF2DOCXConverter = None
 
-_ASCII_CTRL = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F]')
-
-def _drop_nonchars(s: str) -> str:
-    out = []
-    for ch in s:
-        code = ord(ch)
-        if 0xFDD0 <= code <= 0xFDEF or (code & 0xFFFE) == 0xFFFE:
-            continue
-        if 0xD800 <= code <= 0xDFFF:
-            out.append('\uFFFD'); continue
-        out.append(ch)
-    return ''.join(out)
+@st.cache_resource(show_spinner=False)
+def _build_sanitize_table():
+    """Translation table dropping everything XML 1.0 forbids: C0 controls
+    (except tab/newline/CR), DEL, Unicode noncharacters, and the plane-end
+    pairs; lone surrogates map to U+FFFD."""
+    table = {c: None for c in range(0x20) if c not in (0x09, 0x0A, 0x0D)}
+    table[0x7F] = None
+    table.update({c: None for c in range(0xFDD0, 0xFDF0)})
+    for plane in range(0x11):
+        table[(plane << 16) | 0xFFFE] = None
+        table[(plane << 16) | 0xFFFF] = None
+    table.update({c: 0xFFFD for c in range(0xD800, 0xE000)})
+    return table
+
+_SANITIZE_TABLE = _build_sanitize_table()
+
+# Character-class body matching exactly the code points in _SANITIZE_TABLE;
+# shared by the sanitize prefilter and the run-conversion skip gate so the
+# two cannot drift apart.
+_BAD_CHAR_CLASS = (
+    "\x00-\x08\x0B\x0C\x0E-\x1F\x7F﷐-﷯\uD800-\uDFFF"
+    + "".join(chr((plane << 16) | s)
+              for plane in range(0x11) for s in (0xFFFE, 0xFFFF))
+)
 
-def _xml10_filter(text: str) -> str:
-    if not text:
-        return text
-    out = []
-    for ch in text:
-        code = ord(ch)
-        if code in (0x9, 0xA, 0xD) or 0x20 <= code <= 0xD7FF or 0xE000 <= code <= 0xFFFD or 0x10000 <= code <= 0x10FFFF:
-            out.append(ch)
-    return ''.join(out)
+# One engine scan decides whether the translate (and its allocation) is needed.
+_HAS_BAD_RE = re.compile("[" + _BAD_CHAR_CLASS + "]")
 
 def sanitize_for_docx(text: str) -> str:
-    if not text:
+    if not text or _HAS_BAD_RE.search(text) is None:
         return text
-    text = _ASCII_CTRL.sub('', text)
-    text = _drop_nonchars(text)
-    return _xml10_filter(text)
+    return text.translate(_SANITIZE_TABLE)
+
+def _count_opens(text: str, quote: str) -> int:
+    """Count occurrences of `quote` at the start of the text or after
+    whitespace/brackets. str.find skips the non-quote bulk at C speed, so
+    Python only touches the (rare) hit positions."""
+    n = 0
+    i = text.find(quote)
+    while i != -1:
+        if i == 0 or text[i-1].isspace() or text[i-1] in "([{<":
+            n += 1
+        i = text.find(quote, i + 1)
+    return n
 
 def _detect_primary_style(text: str) -> str:
     if not text:
         return "UNKNOWN"
-    singles_open = len(re.findall(r'(^|[\s(\[{<])‘', text))
-    doubles_open = len(re.findall(r'(^|[\s(\[{<])“', text))
+    singles_open = _count_opens(text, "‘")
+    doubles_open = _count_opens(text, "“")
     singles_total = text.count("‘") + text.count("’")
     doubles_total = text.count("“") + text.count("”")
     if singles_open >= doubles_open * 1.5 and singles_open >= 4:
@@ -971,48 +782,216 @@ def _detect_primary_style(text: str) -> str:
         return "UK"
     return "UNKNOWN"
 
+# Sentence-final suffixes for the blank-removal heuristic, equivalent to the
+# old [.!?]"?$ regex on already-stripped text.
+_SENTENCE_END = (".", "!", "?", '."', '!"', '?"')
+
+# pdf2docx artefacts scrubbed from run text: object-replacement chars and form
+# feeds are dropped, NBSPs become plain spaces.
+_PDF_CLEAN_TABLE = str.maketrans({"￼": None, " ": " ", "": None})
+
+# Swap UK-style smart quotes (single-primary) to US style (double-primary)
+# in a single pass: ‘→“, ’→”, “→‘, ”→’.
+_UK2US_QUOTES = str.maketrans({"‘": "“", "’": "”", "“": "‘", "”": "’"})
+
+# Apostrophe patterns, compiled once: in-word apostrophes, leading
+# contractions (’em, ’til, ...) and decades (’90s). The UK pattern fuses
+# all three shapes into one alternation; every match starts with ’, so a
+# single callback strips it and prepends the sentinel.
+_APOS_WORD_RE = re.compile(r"(?<=\w)[’'](?=\w)")
+_US_SMART_RE = re.compile(r'["\'\n]')
+_UK_APOS_RE = re.compile(
+    r"(?<=\w)’(?=\w)"
+    r"|\b’(?:em|cause|til|tis|twas|sup|round|clock)\b"
+    r"|’(?=\d{2}s\b)",
+    re.IGNORECASE)
+
 def normalize_quotes_to_us(text: str) -> str:
     if not text:
         return text
-    APOS = "<<APOS>>"
-    text = re.sub(r"(?<=\w)[’'](?=\w)", APOS, text)
+    if ('"' not in text and "'" not in text and "‘" not in text
+            and "’" not in text and "“" not in text and "”" not in text):
+        # No straight or curly quotes anywhere: nothing to normalize.
+        return text
+    APOS = "\x00"
+    if APOS in text:
+        # NUL never survives sanitize_for_docx; drop strays up front so the
+        # sentinel swap-back cannot fabricate apostrophes from dirty input.
+        text = text.replace(APOS, "")
+    text = _APOS_WORD_RE.sub(APOS, text)
     style = _detect_primary_style(text)
     if style == "UK":
-        OPEN_S, CLOSE_S, OPEN_D, CLOSE_D = "<<OPEN_S>>", "<<CLOSE_S>>", "<<OPEN_D>>", "<<CLOSE_D>>"
-        t = (text.replace("‘", OPEN_S)
-                 .replace("’", CLOSE_S)
-                 .replace("“", OPEN_D)
-                 .replace("”", CLOSE_D))
-        t = re.sub(r'(?<=\w)'+re.escape(CLOSE_S)+r'(?=\w)', APOS, t)
-        for w in ("em","cause","til","tis","twas","sup","round","clock"):
-            t = re.sub(r'\b'+re.escape(CLOSE_S)+w+r'\b', APOS+w, t, flags=re.IGNORECASE)
-        t = re.sub(re.escape(CLOSE_S)+r'(?=\d{2}s\b)', APOS, t)
-        t = (t.replace(OPEN_S,"“").replace(CLOSE_S,"”").replace(OPEN_D,"‘").replace(CLOSE_D,"’"))
-        text = t
+        # Protect apostrophes (in-word, leading contractions, decades) with the
+        # APOS sentinel in one engine pass, then swap all four quote chars in
+        # one translate pass.
+        t = _UK_APOS_RE.sub(lambda m: APOS + m.group(0)[1:], text)
+        text = t.translate(_UK2US_QUOTES)
     else:
-        def smarten_line(line: str) -> str:
-            out, open_d = [], True
-            for ch in line:
-                if ch == '"':
-                    out.append("“" if open_d else "”"); open_d = not open_d
-                elif ch == "'":
-                    out.append("’")
-                else:
-                    out.append(ch)
-            return "".join(out)
-        text = "\n".join(smarten_line(ln) for ln in text.split("\n"))
+        # Let the regex engine skip the non-quote bulk at C speed; Python
+        # only handles the match positions. The open/close toggle resets at
+        # each newline exactly as the old per-line smartener did.
+        out, last, open_d = [], 0, True
+        for m in _US_SMART_RE.finditer(text):
+            out.append(text[last:m.start()])
+            ch = m.group(0)
+            if ch == '"':
+                out.append("“" if open_d else "”")
+                open_d = not open_d
+            elif ch == "'":
+                out.append("’")
+            else:
+                out.append("\n")
+                open_d = True
+            last = m.end()
+        out.append(text[last:])
+        text = "".join(out)
     return text.replace(APOS, "’")
 
+# Any character that sanitize_for_docx or normalize_quotes_to_us could touch
+# (the quote set plus everything _SANITIZE_TABLE strips); runs without a
+# hit are left alone entirely.
+_RUN_TOUCH_RE = re.compile("['\"‘’“”" + _BAD_CHAR_CLASS + "]")
+
+@functools.lru_cache(maxsize=16384)
+def _normalize_text_cached(t: str) -> str:
+    """Normalize already-sanitized text, memoized: short paragraph texts
+    repeat a lot in real documents, so identical inputs skip the whole
+    regex pipeline."""
+    return normalize_quotes_to_us(t)
+
+# Below this many quote-bearing runs, process-pool startup and pickling cost
+# more than the normalization itself.
+_PARALLEL_RUN_THRESHOLD = 20000
+
+def _normalize_texts_chunk(texts):
+    """Worker-side batch for _try_convert_paras_parallel; inputs are already
+    sanitized in the parent."""
+    return [normalize_quotes_to_us(t) for t in texts]
+
+def _apply_normalized_para(r_els, rendered, sanitized, norm) -> None:
+    """Slice a paragraph's normalized text back onto its runs.
+
+    Normalization is one-to-one on sanitized text, so each run's share is
+    the slice matching its sanitized length; if that invariant ever breaks,
+    fall back to normalizing run by run."""
+    if len(norm) != sum(len(s) for s in sanitized):
+        for r_el, t in zip(r_els, rendered):
+            new = normalize_quotes_to_us(sanitize_for_docx(t))
+            if new != t:
+                _DocxRun(r_el, None).text = new
+        return
+    pos = 0
+    for r_el, t, s in zip(r_els, rendered, sanitized):
+        piece = norm[pos:pos + len(s)]
+        pos += len(s)
+        if piece != t:
+            _DocxRun(r_el, None).text = piece
+
+def _try_convert_paras_parallel(jobs) -> bool:
+    """Normalize paragraph jobs across processes; pure CPU-bound string
+    work, so processes beat threads here. Returns False (leaving the serial
+    path to do the work) when the batch is small or workers would have to
+    re-import this script rather than fork."""
+    if sum(len(j[0]) for j in jobs) < _PARALLEL_RUN_THRESHOLD:
+        return False
+    try:
+        import multiprocessing
+        if multiprocessing.get_start_method() != "fork":
+            return False
+        from concurrent.futures import ProcessPoolExecutor
+    except Exception:
+        return False
+    texts = [joined for _, _, _, joined in jobs]
+    chunks = [texts[i:i + 256] for i in range(0, len(texts), 256)]
+    try:
+        with ProcessPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as ex:
+            results = list(ex.map(_normalize_texts_chunk, chunks))
+    except Exception:
+        return False
+    flat = (t for chunk in results for t in chunk)
+    for (r_els, rendered, sanitized, _joined), norm in zip(jobs, flat):
+        _apply_normalized_para(r_els, rendered, sanitized, norm)
+    return True
+
+def _run_render_text(r_el):
+    """Run text as python-docx renders it: w:t content, with tab and
+    br/cr children as \\t and \\n."""
+    parts = []
+    for child in r_el:
+        tag = child.tag
+        if tag == _W_T:
+            parts.append(child.text or "")
+        elif tag == _W_TAB:
+            parts.append("\t")
+        elif tag == _W_BR or tag == _W_CR:
+            parts.append("\n")
+    return "".join(parts)
+
 def convert_docx_runs_to_us(doc: Document) -> None:
-    for p in doc.paragraphs:
-        for r in p.runs:
-            r.text = normalize_quotes_to_us(sanitize_for_docx(r.text))
-    for t in doc.tables:
-        for row in t.rows:
-            for cell in row.cells:
-                for p in cell.paragraphs:
-                    for r in p.runs:
-                        r.text = normalize_quotes_to_us(sanitize_for_docx(r.text))
+    # Walk paragraphs rather than bare runs so quote pairing and UK/US
+    # detection see whole paragraph text; a closing quote or mid-word
+    # apostrophe split across runs is judged in context instead of as a
+    # fragment. Runs are still written individually, and only when their
+    # slice of the normalized paragraph actually changed. The seen set
+    # keeps runs of nested paragraphs (text boxes) with whichever
+    # paragraph claimed them first in document order.
+    jobs = []
+    seen = set()
+    for p_el in doc.element.body.iter(_W_P):
+        r_els = [r for r in p_el.iter(_W_R) if id(r) not in seen]
+        if not r_els:
+            continue
+        rendered = [_run_render_text(r) for r in r_els]
+        if not any(t and _RUN_TOUCH_RE.search(t) for t in rendered):
+            continue
+        seen.update(id(r) for r in r_els)
+        sanitized = [sanitize_for_docx(t) for t in rendered]
+        jobs.append((r_els, rendered, sanitized, "".join(sanitized)))
+    if _try_convert_paras_parallel(jobs):
+        return
+    for r_els, rendered, sanitized, joined in jobs:
+        _apply_normalized_para(r_els, rendered, sanitized,
+                               _normalize_text_cached(joined))
+
+# Local names of the drawing/shape elements scrubbed from converted documents.
+_SHAPE_LOCALNAMES = frozenset(
+    ("drawing", "pict", "object", "sym", "wsp", "txbx", "txbxContent"))
+
+def _localname(node):
+    tag = node.tag
+    return tag.rpartition('}')[2] if isinstance(tag, str) else ''
+
+def _clean_part_element(elt) -> None:
+    """Clean one part with a single tree walk: classify nodes up front, then
+    drop shapes, childless runs, and paragraphs left without real text."""
+    shapes, runs, paras = [], [], []
+    for node in elt.iter():
+        local = _localname(node)
+        if local in _SHAPE_LOCALNAMES:
+            shapes.append(node)
+        elif local == 'r':
+            runs.append(node)
+        elif local == 'p':
+            paras.append(node)
+    for n in shapes:
+        parent = n.getparent()
+        if parent is not None:
+            parent.remove(n)
+    # Emptiness is evaluated here, after shape removal, matching the old
+    # three-phase ordering.
+    for r in runs:
+        if len(r) == 0:
+            parent = r.getparent()
+            if parent is not None:
+                parent.remove(r)
+    for p in paras:
+        for t in p.iter():
+            if _localname(t) == 't' and t.text and t.text.strip():
+                break
+        else:
+            parent = p.getparent()
+            if parent is not None:
+                parent.remove(p)
 
 def _remove_global_shapes_all_parts(doc: Document) -> None:
     """
@@ -1020,38 +999,33 @@ def _remove_global_shapes_all_parts(doc: Document) -> None:
     (headers/footers), then remove empty runs and paragraphs.
     """
     pkg = doc.part.package
+    elts = []
     for part in pkg.parts:
-        elt = getattr(part, 'element', None)
-        if elt is None:
+        # Only WordprocessingML/DrawingML parts can hold the shapes we scrub;
+        # skip binary parts (pdf2docx embeds plenty of images) without probing.
+        ctype = getattr(part, 'content_type', '') or ''
+        if not ctype.startswith((
+            'application/vnd.openxmlformats-officedocument.wordprocessingml',
+            'application/vnd.openxmlformats-officedocument.drawingml',
+        )):
             continue
-        # 1) Remove drawings/picts/objects/symbols and deep textbox containers
-        nodes = list(elt.xpath(
-            './/*[local-name()="drawing" or local-name()="pict" or local-name()="object" or local-name()="sym" or local-name()="wsp" or local-name()="txbx" or local-name()="txbxContent"]'
-        ))
-        for n in nodes:
-            parent = n.getparent()
-            if parent is not None:
-                parent.remove(n)
-        # 2) Remove empty runs
-        for r in list(elt.xpath('.//*[local-name()="r"]')):
-            has_text = bool(r.xpath('.//*[local-name()="t" and normalize-space(text())]'))
-            has_children = len(r) > 0
-            if not has_text and not has_children:
-                parent = r.getparent()
-                if parent is not None:
-                    parent.remove(r)
-        # 3) Remove paragraphs that are now empty or whitespace-only
-        for p in list(elt.xpath('.//*[local-name()="p"]')):
-            has_text = bool(p.xpath('.//*[local-name()="t" and normalize-space(text())]'))
-            has_draw = bool(p.xpath('.//*[local-name()="drawing" or local-name()="pict" or local-name()="object" or local-name()="sym" or local-name()="wsp" or local-name()="txbx" or local-name()="txbxContent"]'))
-            if not has_text and not has_draw:
-                parent = p.getparent()
-                if parent is not None:
-                    parent.remove(p)
+        elt = getattr(part, 'element', None)
+        if elt is not None:
+            elts.append(elt)
+    if len(elts) <= 1:
+        for elt in elts:
+            _clean_part_element(elt)
+        return
+    # Parts are independent lxml trees and the traversal/removal work runs
+    # in libxml2 with the GIL dropped, so headers/footers/notes clean up
+    # in parallel with the main document.
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as ex:
+        list(ex.map(_clean_part_element, elts))
 
 def convert_docx_bytes_to_us(docx_bytes: bytes) -> bytes:
     if Document is None:
         raise RuntimeError("python-docx required.")
+    _normalize_text_cached.cache_clear()  # bound memory between conversions
     doc = Document(io.BytesIO(docx_bytes))
     convert_docx_runs_to_us(doc)
     out = io.BytesIO(); doc.save(out)
@@ -1062,38 +1036,89 @@ def pdf_bytes_to_docx_using_pdf2docx(pdf_bytes: bytes) -> bytes:
         raise RuntimeError("python-docx required.")
     if PDF2DOCXConverter is None:
         raise RuntimeError("pdf2docx required.")
+    _normalize_text_cached.cache_clear()  # bound memory between conversions
     with tempfile.TemporaryDirectory() as tmpd:
-        pdf_path = os.path.join(tmpd, "in.pdf")
         out_path = os.path.join(tmpd, "out.docx")
-        with open(pdf_path, "wb") as f: f.write(pdf_bytes)
-        cv = PDF2DOCXConverter(pdf_path)
-        cv.convert(out_path, start=0, end=None)
+        pdf_path = None
+        try:
+            # Feed the PDF straight from memory; avoids writing (and re-reading)
+            # a temp copy of a potentially large upload.
+            cv = PDF2DOCXConverter(stream=pdf_bytes)
+        except TypeError:
+            # Older pdf2docx without stream support: fall back to an on-disk PDF.
+            pdf_path = os.path.join(tmpd, "in.pdf")
+            with open(pdf_path, "wb") as f: f.write(pdf_bytes)
+            cv = PDF2DOCXConverter(pdf_path)
+        try:
+            page_count = cv.fitz_doc.page_count
+        except Exception:
+            page_count = 0
+        # Page-level parallelism: worth it on multi-page PDFs, but process-pool
+        # startup costs more than it saves on very short documents.
+        convert_kwargs = {}
+        if page_count >= 3:
+            if pdf_path is None:
+                # pdf2docx's workers re-open the PDF via the converter's
+                # filename, which is None for stream input, so parallel
+                # conversion needs a path-backed converter.
+                cv.close()
+                pdf_path = os.path.join(tmpd, "in.pdf")
+                with open(pdf_path, "wb") as f: f.write(pdf_bytes)
+                cv = PDF2DOCXConverter(pdf_path)
+            convert_kwargs = {"multi_processing": True,
+                              "cpu_count": min(os.cpu_count() or 2, 8)}
+        try:
+            cv.convert(out_path, start=0, end=None, **convert_kwargs)
+        except TypeError:
+            cv.convert(out_path, start=0, end=None)
         cv.close()
-        doc = Document(out_path)
-        fix_dropcaps_acbd(doc)
-        acbd_write_log()
+        # Pull the converted package into memory in one read; post-processing
+        # then runs without the tempdir (python-docx would otherwise reopen
+        # and re-read the file itself).
+        with open(out_path, "rb") as f:
+            docx_buf = io.BytesIO(f.read())
+    doc = Document(docx_buf)
+    fix_dropcaps_acbd(doc)
+    acbd_write_log()
+
+    # 1) Deep removal across all parts (fix persistent squares)
+    _remove_global_shapes_all_parts(doc)
+
+    # 2) Run-level cleanup and cautious mid-sentence blank removal
+    # The artefact scrub is per-character, so it can run on each w:t node
+    # directly without rebuilding whole runs through the wrapper setter.
+    for t_el in doc.element.body.iter(_W_T):
+        t = t_el.text
+        if t and ("\uFFFC" in t or "\u00A0" in t or "\u000c" in t):
+            t_el.text = t.translate(_PDF_CLEAN_TABLE)
+    paras = doc.paragraphs
+    # Paragraph.text concatenates runs on every access, so materialize the
+    # stripped texts once instead of re-reading neighbours per iteration.
+    stripped = [_para_text_fast(p).strip() for p in paras]
+    for i, p in enumerate(paras):
+        if stripped[i] in {"", "\u00A0"} and 0 < i < len(paras)-1:
+            prev = stripped[i-1]
+            nxt  = stripped[i+1]
+            if prev and nxt and not prev.endswith(_SENTENCE_END):
+                if any(c.tag != _W_PPR for c in p._element):
+                    _set_paragraph_text_fast(p, "")
+                stripped[i] = ""
+
+    # 3) Normalize quotes to US
+    convert_docx_runs_to_us(doc)
 
-        # 1) Deep removal across all parts (fix persistent squares)
-        _remove_global_shapes_all_parts(doc)
+    buf = io.BytesIO(); doc.save(buf); return buf.getvalue()
 
-        # 2) Run-level cleanup and cautious mid-sentence blank removal
-        paras = doc.paragraphs
-        for i, p in enumerate(paras):
-            for r in p.runs:
-                if r.text:
-                    r.text = (r.text.replace("\uFFFC","")
-                                   .replace("\u00A0"," ")
-                                   .replace("\u000c",""))
-            if p.text.strip() in {"", "\u00A0"} and 0 < i < len(paras)-1:
-                prev = paras[i-1].text.strip()
-                nxt  = paras[i+1].text.strip()
-                if prev and nxt and not re.search(r'[.!?]"?$', prev):
-                    p.text = ""
-
-        # 3) Normalize quotes to US
-        convert_docx_runs_to_us(doc)
-
-        buf = io.BytesIO(); doc.save(buf); return buf.getvalue()
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_docx_to_us(docx_bytes: bytes) -> bytes:
+    """Memoized DOCX conversion: Streamlit reruns the script on every widget
+    interaction, so identical uploads skip the whole pipeline."""
+    return convert_docx_bytes_to_us(docx_bytes)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def _cached_pdf_to_docx(pdf_bytes: bytes) -> bytes:
+    """Memoized PDF conversion; keyed on the uploaded bytes."""
+    return pdf_bytes_to_docx_using_pdf2docx(pdf_bytes)
 
 st.set_page_config(page_title="Quote Style Converter (Global Clean v3)", page_icon="📝", layout="centered")
 
@@ -1217,7 +1242,7 @@ if uploaded is not None:
 
                     except NameError:
 
-                        out_bytes = convert_docx_bytes_to_us(raw)
+                        out_bytes = _cached_docx_to_us(raw)
 
                     st.success("Converted. Download below.")
 
@@ -1250,7 +1275,8 @@ if uploaded is not None:
                 st.error("pdf2docx not available; cannot convert PDF to DOCX.")
             else:
                 try:
-                    out_bytes = pdf_bytes_to_docx_using_pdf2docx(uploaded.read())
+                    with st.spinner("Converting PDF to DOCX…"):
+                        out_bytes = _cached_pdf_to_docx(uploaded.read())
                     st.success("Converted. Download below.")
                     base = uploaded.name.rsplit(".",1)[0]
                     st.download_button("Download File", out_bytes,